@@ -2,16 +2,20 @@ import os
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import csv
+from collections import defaultdict
 import shutil # For copying files for QC Docs
 import pikepdf # New PDF library
 
-from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.units import inch
 import tempfile
 import threading
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import sys # Import sys to help with path for bundled executable
 
 # Register Verdana font if available, though placeholders will use Helvetica.
@@ -32,52 +36,61 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
-def create_placeholder_pdf(control_number_with_suffix):
+def _pdf_text_literal(text):
+    """Encodes text as a PDF literal string for the WinAnsi-encoded standard fonts."""
+    encoded = text.encode("cp1252", errors="replace")
+    return b"(" + encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+def create_placeholder_pdf(control_number_with_suffix, placeholder_dir=None):
     """
-    Creates a placeholder PDF using ReportLab.
-    The "cleaning" step with PyPDF2 is removed; pikepdf will handle merging.
+    Creates a placeholder PDF directly with pikepdf: one page, standard Helvetica fonts
+    and a single content stream. ReportLab is only used for the font metrics.
     'control_number_with_suffix' is the full base name, e.g., "CTRL001.1"
+    'placeholder_dir' is where the file is created (the system temp folder if None).
     """
-    path_rl = None
+    path_placeholder = None
     try:
-        fd_rl, path_rl_temp = tempfile.mkstemp(suffix=f"_rl_placeholder_{control_number_with_suffix}.pdf", prefix="tmp_merger_")
-        os.close(fd_rl)
-        path_rl = path_rl_temp
+        fd_placeholder, path_placeholder_temp = tempfile.mkstemp(suffix=f"_placeholder_{control_number_with_suffix}.pdf", prefix="tmp_merger_", dir=placeholder_dir)
+        os.close(fd_placeholder)
+        path_placeholder = path_placeholder_temp
 
-        c = canvas.Canvas(path_rl, pagesize=letter)
         width, height = letter
-        c.setFont("Helvetica-Bold", 24)
         main_message = "PRODUCED IN NATIVE FORMAT"
-        message_y_main = height / 2 + 50
-        c.drawCentredString(width / 2.0, message_y_main, main_message)
+        x_main = (width - pdfmetrics.stringWidth(main_message, "Helvetica-Bold", 24)) / 2.0
+        y_main = height / 2 + 50
 
-        c.setFont("Helvetica", 10)
         footer_text = control_number_with_suffix
         text_width_footer = pdfmetrics.stringWidth(footer_text, "Helvetica", 10)
         x_footer = width - text_width_footer - (0.75 * inch)
         y_footer = 0.5 * inch
-        c.drawString(x_footer, y_footer, footer_text)
-        c.showPage()
-        c.save() # ReportLab closes the file here.
-        
-        # Check if the created PDF has pages (basic validation)
-        try:
-            with pikepdf.Pdf.open(path_rl) as temp_pdf_check:
-                if not temp_pdf_check.pages:
-                    raise ValueError(f"ReportLab PDF for {control_number_with_suffix} has no pages after creation.")
-        except Exception as e_check: # Catch pikepdf.PdfError or other issues opening
-            print(f"ERROR: Placeholder {control_number_with_suffix} created by ReportLab is invalid or unreadable by pikepdf: {e_check}")
-            if os.path.exists(path_rl):
-                try: os.unlink(path_rl)
-                except OSError: pass
-            return None
-
-        return path_rl # Return the path to the ReportLab-generated PDF
+
+        content = (
+            b"BT /F1 24 Tf %.2f %.2f Td %s Tj ET\n" % (x_main, y_main, _pdf_text_literal(main_message))
+            + b"BT /F2 10 Tf %.2f %.2f Td %s Tj ET\n" % (x_footer, y_footer, _pdf_text_literal(footer_text))
+        )
+
+        with pikepdf.Pdf.new() as placeholder_pdf:
+            fonts = pikepdf.Dictionary(
+                F1=pikepdf.Dictionary(Type=pikepdf.Name.Font, Subtype=pikepdf.Name.Type1,
+                                      BaseFont=pikepdf.Name("/Helvetica-Bold"), Encoding=pikepdf.Name.WinAnsiEncoding),
+                F2=pikepdf.Dictionary(Type=pikepdf.Name.Font, Subtype=pikepdf.Name.Type1,
+                                      BaseFont=pikepdf.Name.Helvetica, Encoding=pikepdf.Name.WinAnsiEncoding),
+            )
+            page = pikepdf.Dictionary(
+                Type=pikepdf.Name.Page,
+                MediaBox=[0, 0, width, height],
+                Resources=pikepdf.Dictionary(Font=fonts),
+                Contents=placeholder_pdf.make_stream(content),
+            )
+            placeholder_pdf.pages.append(pikepdf.Page(page))
+            placeholder_pdf.save(path_placeholder) # Raises on failure, so no re-check is needed
+
+        return path_placeholder # Return the path to the generated PDF
 
     except Exception as e:
-        print(f"ERROR: Failed to create placeholder for {control_number_with_suffix} with ReportLab: {e}")
-        if path_rl and os.path.exists(path_rl): # Clean up if ReportLab failed mid-way
-            try: os.unlink(path_rl)
+        print(f"ERROR: Failed to create placeholder for {control_number_with_suffix}: {e}")
+        if path_placeholder and os.path.exists(path_placeholder): # Clean up if writing failed mid-way
+            try: os.unlink(path_placeholder)
             except OSError: pass
         return None # Indicate failure
 
@@ -102,13 +115,123 @@ def extract_suffix_parts(filename):
     return suffix_parts
 
 
+def _merge_one_family(family_key, files_to_merge, output_path):
+    """
+    Merges one family into a single PDF at 'output_path' using pikepdf.
+    Runs in a worker process, so it only takes and returns plain strings and ints.
+    'files_to_merge' is a list of (filename, path) tuples, already in merge order.
+    Returns (output_path or None, number of files added, list of log messages).
+    """
+    messages = []
+    final_output_filename = os.path.basename(output_path)
+
+    # A family that is just one real PDF needs no merging; a plain copy is much faster.
+    # Only copy it if pikepdf opens it cleanly (no recovery), it has pages, and the merge would not
+    # change it in a way that matters: the merge writes an unencrypted file with only the pages, so
+    # encrypted files and files with forms, attachments, bookmarks or document actions are merged as before.
+    if len(files_to_merge) == 1 and files_to_merge[0][0].lower().endswith(".pdf"):
+        filename_to_add, path_to_add = files_to_merge[0]
+        try:
+            with pikepdf.Pdf.open(path_to_add, access_mode=pikepdf.AccessMode.mmap, attempt_recovery=False) as source_pdf:
+                safe_to_copy = (
+                    len(source_pdf.pages) > 0
+                    and not source_pdf.is_encrypted
+                    and not any(key in source_pdf.Root for key in ("/AcroForm", "/Names", "/Outlines", "/OpenAction", "/AA"))
+                )
+        except Exception:
+            safe_to_copy = False
+        if safe_to_copy:
+            try:
+                shutil.copy2(path_to_add, output_path)
+                messages.append(f"Successfully merged 1 file(s) into: {os.path.join('Merged PDFs', final_output_filename)}")
+                return output_path, 1, messages
+            except OSError as e:
+                messages.append(f"ERROR: Could not copy {filename_to_add} (Path: {path_to_add}) to {final_output_filename}: {e}")
+                return None, 0, messages
+
+    final_merged_pdf = None # Created on the first readable source, so families with nothing to merge skip it
+    open_source_pdfs = [] # Sources stay open until the merged PDF has been saved
+    files_successfully_added_to_merger = 0
+
+    try:
+        for filename_to_add, path_to_add in files_to_merge:
+            try:
+                source_pdf = pikepdf.Pdf.open(path_to_add, access_mode=pikepdf.AccessMode.mmap)
+                if not source_pdf.pages:
+                    source_pdf.close()
+                    messages.append(f"WARNING: File {filename_to_add} (Path: {path_to_add}) is a PDF with no pages (pikepdf). Skipping.")
+                    continue
+                open_source_pdfs.append(source_pdf)
+                if final_merged_pdf is None:
+                    final_merged_pdf = pikepdf.Pdf.new()
+                for page in source_pdf.pages:
+                    final_merged_pdf.pages.append(page)
+                files_successfully_added_to_merger += 1
+            except FileNotFoundError: # Paths were produced this run, so a missing file is a real error
+                messages.append(f"ERROR: File {filename_to_add} (Path: {path_to_add}) no longer exists. Skipping this file.")
+            except pikepdf.PdfError as e_pike: # Catch specific pikepdf errors
+                 messages.append(f"ERROR: pikepdf could not read/process {filename_to_add} (Path: {path_to_add}): {e_pike}. Skipping this file.")
+            except Exception as e: 
+                messages.append(f"ERROR: Could not append {filename_to_add} (Path: {path_to_add}) using pikepdf: {e}. Skipping this file.")
+
+        if files_successfully_added_to_merger == 0:
+            messages.append(f"No files were successfully added to the merger for family {family_key}. No output generated.")
+            return None, 0, messages
+
+        try:
+            final_merged_pdf.remove_unreferenced_resources()
+            # Already-compressed streams from the sources are copied through without re-encoding,
+            # and packing objects into object streams keeps the xref table and file size down.
+            final_merged_pdf.save(
+                output_path,
+                linearize=False,
+                object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                compress_streams=True,
+                recompress_flate=False,
+                stream_decode_level=pikepdf.StreamDecodeLevel.none,
+            )
+            messages.append(f"Successfully merged {files_successfully_added_to_merger} file(s) into: {os.path.join('Merged PDFs', final_output_filename)}")
+        except Exception as e:
+            messages.append(f"ERROR: Could not write merged PDF {final_output_filename} using pikepdf: {e}")
+            return None, files_successfully_added_to_merger, messages
+        return output_path, files_successfully_added_to_merger, messages
+    finally:
+        if final_merged_pdf is not None: final_merged_pdf.close()
+        for source_pdf in open_source_pdfs:
+            source_pdf.close()
+
+
 def merge_pdfs_worker(folder_path, progress_callback, completion_callback, log_callback_gui):
     """Worker function to handle PDF merging and extended output using pikepdf."""
     
-    local_log_entries = []
+    csv_writer = None 
+    log_csvfile = None 
+    def stop_csv_log(e):
+        # A failing log file (disk full, share dropped) must not stop the merge; fall back to the GUI log only.
+        nonlocal csv_writer, log_csvfile
+        failed_csvfile = log_csvfile
+        csv_writer = None
+        log_csvfile = None
+        log_callback_gui(f"ERROR: Could not write CSV log file: {e}")
+        try:
+            failed_csvfile.close()
+        except OSError:
+            pass
+
     def log_message(message):
         log_callback_gui(message) 
-        local_log_entries.append([message]) 
+        if csv_writer:
+            try:
+                csv_writer.writerow([message]) 
+            except OSError as e:
+                stop_csv_log(e)
+
+    def flush_log():
+        if log_csvfile:
+            try:
+                log_csvfile.flush()
+            except OSError as e:
+                stop_csv_log(e)
 
     base_output_folder = os.path.join(folder_path, "Merged Output")
     merged_pdfs_output_path = os.path.join(base_output_folder, "Merged PDFs")
@@ -118,179 +241,223 @@ def merge_pdfs_worker(folder_path, progress_callback, completion_callback, log_c
         os.makedirs(base_output_folder, exist_ok=True)
         os.makedirs(merged_pdfs_output_path, exist_ok=True)
         os.makedirs(qc_docs_output_path, exist_ok=True)
-        log_message(f"Output folders created/ensured: {base_output_folder}")
     except OSError as e:
         log_message(f"CRITICAL ERROR: Could not create output directories: {e}")
         completion_callback(False) 
         return
 
-    all_files_in_folder = []
+    # The CSV log is written as messages arrive and flushed after each family,
+    # so a crash still leaves a partial log behind.
+    log_csv_path = os.path.join(base_output_folder, "Merge Log.csv")
     try:
-        all_files_in_folder = os.listdir(folder_path)
-    except OSError as e:
-        log_message(f"ERROR: Could not read source directory: {folder_path}. {e}")
-        completion_callback(False)
-        return
+        log_csvfile = open(log_csv_path, 'w', newline='', encoding='utf-8', buffering=1 << 16)
+        csv_writer = csv.writer(log_csvfile)
+        csv_writer.writerow(['Message']) 
+    except IOError as e:
+        log_message(f"ERROR: Could not write CSV log file: {e}")
+    log_message(f"Output folders created/ensured: {base_output_folder}")
 
-    families = {} 
-    file_path_map = {} 
-    placeholder_files_to_delete = set() 
-    family_had_native_placeholder = {} 
+    merge_succeeded = False 
+    placeholder_dir = None 
+    try:
+        source_entries = []
+        try:
+            # os.scandir hands back the entry type with the name, avoiding a stat per file.
+            with os.scandir(folder_path) as dir_iterator:
+                source_entries = [
+                    entry for entry in dir_iterator
+                    if not entry.is_dir() and not entry.name.lower().startswith("tmp_merger_")
+                ]
+        except OSError as e:
+            log_message(f"ERROR: Could not read source directory: {folder_path}. {e}")
+            return
 
-    max_files_in_family_count = 0
-    largest_family_merged_pdf_src_path = None 
-    first_family_with_native_src_path = None  
+        families = defaultdict(list) 
+        file_path_map = {} 
+        family_had_native_placeholder = {} 
 
-    log_message("Starting Pass 1: Identifying families and creating placeholders...")
-    for filename_from_dir in all_files_in_folder:
-        full_path = os.path.join(folder_path, filename_from_dir)
-        
-        if os.path.isdir(full_path): 
-            continue
-        if filename_from_dir.lower().startswith("tmp_merger_"): 
-            continue
+        max_files_in_family_count = 0
+        largest_family_merged_pdf_src_path = None 
+        first_family_with_native_src_path = None  
+
+        log_message("Starting Pass 1: Identifying families and creating placeholders...")
+        for entry in source_entries:
+            filename_from_dir = entry.name
+            full_path = entry.path
 
-        base_name_no_ext, ext = os.path.splitext(filename_from_dir)
-        family_key = extract_family_key(filename_from_dir)
+            base_name_no_ext, ext = os.path.splitext(filename_from_dir)
+            family_key = extract_family_key(filename_from_dir)
         
-        families.setdefault(family_key, []).append(filename_from_dir)
+            families[family_key].append(filename_from_dir)
 
-        if ext.lower() == ".pdf":
-            file_path_map[filename_from_dir] = full_path
-        else: 
-            log_message(f"Creating placeholder for native file: {filename_from_dir}")
-            placeholder_path = create_placeholder_pdf(base_name_no_ext)
-            if placeholder_path: 
-                file_path_map[filename_from_dir] = placeholder_path
-                placeholder_files_to_delete.add(placeholder_path) 
-                family_had_native_placeholder[family_key] = True 
+            if ext.lower() == ".pdf":
+                file_path_map[filename_from_dir] = full_path
             else: 
-                log_message(f"ERROR: Failed to create placeholder for {filename_from_dir}. It will be skipped.")
-                if family_key in families and filename_from_dir in families[family_key]:
-                    families[family_key].remove(filename_from_dir) 
-    log_message("Pass 1 completed.")
-
-
-    total_families_to_process = len(families)
-    processed_families_count = 0
-
-    log_message("Starting Pass 2: Merging PDF families using pikepdf...")
-    for family_key, original_filenames_in_family in families.items():
-        valid_files_in_family = [
-            fname for fname in original_filenames_in_family if fname in file_path_map
-        ]
-
-        if not valid_files_in_family:
-            log_message(f"No valid files to merge for family {family_key}. Skipping.")
-            processed_families_count += 1
-            progress_callback(processed_families_count, total_families_to_process)
-            continue
+                # All placeholders go in one temp folder so cleanup is a single rmtree.
+                if placeholder_dir is None:
+                    try:
+                        placeholder_dir = tempfile.mkdtemp(prefix="tmp_merger_")
+                    except OSError as e:
+                        log_message(f"CRITICAL ERROR: Could not create temporary placeholder folder: {e}")
+                        return
+                log_message(f"Creating placeholder for native file: {filename_from_dir}")
+                placeholder_path = create_placeholder_pdf(base_name_no_ext, placeholder_dir)
+                if placeholder_path: 
+                    file_path_map[filename_from_dir] = placeholder_path
+                    family_had_native_placeholder[family_key] = True 
+                else: 
+                    log_message(f"ERROR: Failed to create placeholder for {filename_from_dir}. It will be skipped.")
+                    if family_key in families and filename_from_dir in families[family_key]:
+                        families[family_key].remove(filename_from_dir) 
+        log_message("Pass 1 completed.")
+        flush_log()
+
+
+        total_families_to_process = len(families)
+        processed_families_count = 0
+        merge_jobs = [] 
+
+        log_message("Starting Pass 2: Merging PDF families using pikepdf...")
+        for family_key, original_filenames_in_family in families.items():
+            valid_files_in_family = [
+                fname for fname in original_filenames_in_family if fname in file_path_map
+            ]
+
+            if not valid_files_in_family:
+                log_message(f"No valid files to merge for family {family_key}. Skipping.")
+                processed_families_count += 1
+                progress_callback(processed_families_count, total_families_to_process)
+                continue
             
-        valid_files_in_family.sort(key=lambda fname: (
-            len(extract_suffix_parts(fname)), 
-            extract_suffix_parts(fname)      
-        ))
+            # Parse each filename's suffix once, then sort on the precomputed parts.
+            decorated_files = [(extract_suffix_parts(fname), fname) for fname in valid_files_in_family]
+            decorated_files.sort(key=lambda item: (len(item[0]), item[0]))
         
-        sorted_filenames_for_merge = valid_files_in_family
-
-        # Use pikepdf for merging
-        final_merged_pdf = pikepdf.Pdf.new() # Create a new empty PDF
-        files_successfully_added_to_merger = 0
-        current_family_contained_native = family_had_native_placeholder.get(family_key, False)
-        
-        log_message(f"Processing family: {family_key}. Files to merge (in order): {', '.join(sorted_filenames_for_merge)}")
-
-        for filename_to_add in sorted_filenames_for_merge:
-            path_to_add = file_path_map.get(filename_to_add) 
-            
-            if not path_to_add or not os.path.exists(path_to_add):
-                log_message(f"WARNING: File path for {filename_to_add} not found or file does not exist. Skipping.")
-                continue
-            try:
-                with pikepdf.Pdf.open(path_to_add) as source_pdf:
-                    if not source_pdf.pages:
-                        log_message(f"WARNING: File {filename_to_add} (Path: {path_to_add}) is a PDF with no pages (pikepdf). Skipping.")
-                        continue
-                    final_merged_pdf.pages.extend(source_pdf.pages)
-                files_successfully_added_to_merger += 1
-            except pikepdf.PdfError as e_pike: # Catch specific pikepdf errors
-                 log_message(f"ERROR: pikepdf could not read/process {filename_to_add} (Path: {path_to_add}): {e_pike}. Skipping this file.")
-            except Exception as e: 
-                log_message(f"ERROR: Could not append {filename_to_add} (Path: {path_to_add}) using pikepdf: {e}. Skipping this file.")
+            sorted_filenames_for_merge = [fname for _, fname in decorated_files]
 
-        if files_successfully_added_to_merger > 0:
             output_filename_original = sorted_filenames_for_merge[0]
             base_output_name, _ = os.path.splitext(output_filename_original)
             final_output_filename = f"{base_output_name}.pdf" 
-            
             current_merged_pdf_final_path = os.path.join(merged_pdfs_output_path, final_output_filename)
-            try:
-                final_merged_pdf.save(current_merged_pdf_final_path)
-                log_message(f"Successfully merged {files_successfully_added_to_merger} file(s) into: {os.path.join('Merged PDFs', final_output_filename)}")
-
-                if files_successfully_added_to_merger > max_files_in_family_count:
-                    max_files_in_family_count = files_successfully_added_to_merger
-                    largest_family_merged_pdf_src_path = current_merged_pdf_final_path
-                
-                if current_family_contained_native and first_family_with_native_src_path is None:
-                    first_family_with_native_src_path = current_merged_pdf_final_path
-
-            except Exception as e:
-                log_message(f"ERROR: Could not write merged PDF {final_output_filename} using pikepdf: {e}")
-        else:
-            log_message(f"No files were successfully added to the merger for family {family_key}. No output generated.")
-
-        processed_families_count += 1
-        progress_callback(processed_families_count, total_families_to_process)
-    log_message("Pass 2 completed.")
 
-    log_message("Processing QC documents...")
-    qc_files_copied_for_log = set() 
+            files_to_merge = [(fname, file_path_map[fname]) for fname in sorted_filenames_for_merge]
+            merge_jobs.append((family_key, files_to_merge, current_merged_pdf_final_path))
+
+        # Merge families in worker processes; only plain strings cross the process boundary.
+        # Results are consumed in submission order, so the log reads family by family.
+        # A worker dying (e.g. a QPDF crash or an OOM kill) breaks the whole pool; stop the run cleanly.
+        merge_futures = []
+        merge_results_logged = 0
+        def log_unfinished_merges():
+            # Families that never reached the log: record what happened to each so the CSV matches Merged PDFs.
+            for (family_key, _, output_path), merge_future in zip(merge_jobs[merge_results_logged:], merge_futures[merge_results_logged:]):
+                if merge_future.cancelled():
+                    log_message(f"Family {family_key} was not merged because Pass 2 was stopped.")
+                elif merge_future.exception() is not None:
+                    # The cause was logged once above; BrokenProcessPool repeats it for every queued family.
+                    log_message(f"ERROR: Family {family_key} was not merged ({type(merge_future.exception()).__name__}).")
+                    if os.path.exists(output_path):
+                        try:
+                            os.remove(output_path)
+                            log_message(f"Removed incomplete output for family {family_key}: {output_path}")
+                        except OSError as e:
+                            log_message(f"WARNING: Could not remove incomplete output {output_path}: {e}")
+                else:
+                    _, _, family_messages = merge_future.result()
+                    log_message(f"Processing family: {family_key} (finished before Pass 2 was stopped).")
+                    for message in family_messages:
+                        log_message(message)
 
-    if largest_family_merged_pdf_src_path and os.path.exists(largest_family_merged_pdf_src_path):
         try:
-            dest_filename = os.path.basename(largest_family_merged_pdf_src_path)
-            dest_path = os.path.join(qc_docs_output_path, dest_filename)
-            shutil.copy2(largest_family_merged_pdf_src_path, dest_path) 
-            log_message(f"Copied largest family PDF to QC Docs: {dest_filename}")
-            qc_files_copied_for_log.add(largest_family_merged_pdf_src_path)
+            if merge_jobs:
+                with ProcessPoolExecutor(max_workers=None) as executor: # None = cpu_count(), capped at 61 on Windows
+                    merge_futures = [executor.submit(_merge_one_family, *merge_job) for merge_job in merge_jobs]
+                    try:
+                        for merge_job, merge_future in zip(merge_jobs, merge_futures):
+                            family_key, files_to_merge, _ = merge_job
+                            merged_pdf_path, files_successfully_added_to_merger, family_messages = merge_future.result()
+                            log_message(f"Processing family: {family_key}. Files to merge (in order): {', '.join(fname for fname, _ in files_to_merge)}")
+                            for message in family_messages:
+                                log_message(message)
+                            merge_results_logged += 1
+
+                            if merged_pdf_path:
+                                if files_successfully_added_to_merger > max_files_in_family_count:
+                                    max_files_in_family_count = files_successfully_added_to_merger
+                                    largest_family_merged_pdf_src_path = merged_pdf_path
+
+                                current_family_contained_native = family_had_native_placeholder.get(family_key, False)
+                                if current_family_contained_native and first_family_with_native_src_path is None:
+                                    first_family_with_native_src_path = merged_pdf_path
+
+                            processed_families_count += 1
+                            progress_callback(processed_families_count, total_families_to_process)
+                            flush_log()
+                    except BaseException:
+                        # Leaving the with-block alone would wait for, and run, every queued family.
+                        executor.shutdown(wait=True, cancel_futures=True)
+                        raise
+        except BrokenProcessPool as e:
+            log_message(f"CRITICAL ERROR: A merge worker process exited unexpectedly; remaining families were cancelled. {e}")
+            log_unfinished_merges()
+            return
         except Exception as e:
-            log_message(f"ERROR copying largest family PDF to QC Docs: {e}")
+            log_message(f"CRITICAL ERROR: Pass 2 was stopped by an unexpected error; remaining families were cancelled. {e}")
+            log_unfinished_merges()
+            return
+        log_message("Pass 2 completed.")
+
+        log_message("Processing QC documents...")
+        qc_files_copied_for_log = set() 
 
-    if first_family_with_native_src_path and os.path.exists(first_family_with_native_src_path):
-        if first_family_with_native_src_path != largest_family_merged_pdf_src_path:
+        if largest_family_merged_pdf_src_path and os.path.exists(largest_family_merged_pdf_src_path):
             try:
-                dest_filename = os.path.basename(first_family_with_native_src_path)
+                dest_filename = os.path.basename(largest_family_merged_pdf_src_path)
                 dest_path = os.path.join(qc_docs_output_path, dest_filename)
-                shutil.copy2(first_family_with_native_src_path, dest_path)
-                log_message(f"Copied first PDF with native placeholder to QC Docs: {dest_filename}")
-                qc_files_copied_for_log.add(first_family_with_native_src_path)
+                shutil.copy2(largest_family_merged_pdf_src_path, dest_path) 
+                log_message(f"Copied largest family PDF to QC Docs: {dest_filename}")
+                qc_files_copied_for_log.add(largest_family_merged_pdf_src_path)
             except Exception as e:
-                log_message(f"ERROR copying PDF with native to QC Docs: {e}")
-        elif first_family_with_native_src_path not in qc_files_copied_for_log: 
-             log_message(f"Largest family PDF ({os.path.basename(largest_family_merged_pdf_src_path)}) also contained a native; already copied for QC.")
-    elif not any(family_had_native_placeholder.values()): 
-        log_message("No families contained native placeholders; no specific QC doc for this criterion.")
-
-    log_csv_path = os.path.join(base_output_folder, "Merge Log.csv")
-    try:
-        with open(log_csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-            csv_writer = csv.writer(csvfile)
-            csv_writer.writerow(['Message']) 
-            csv_writer.writerows(local_log_entries) 
-        log_message(f"Merge log saved to: {os.path.join('Merged Output', 'Merge Log.csv')}")
-    except IOError as e:
-        log_message(f"ERROR: Could not write CSV log file: {e}")
-
-    log_message("Cleaning up temporary files...")
-    for temp_path in placeholder_files_to_delete: 
+                log_message(f"ERROR copying largest family PDF to QC Docs: {e}")
+
+        if first_family_with_native_src_path and os.path.exists(first_family_with_native_src_path):
+            if first_family_with_native_src_path != largest_family_merged_pdf_src_path:
+                try:
+                    dest_filename = os.path.basename(first_family_with_native_src_path)
+                    dest_path = os.path.join(qc_docs_output_path, dest_filename)
+                    shutil.copy2(first_family_with_native_src_path, dest_path)
+                    log_message(f"Copied first PDF with native placeholder to QC Docs: {dest_filename}")
+                    qc_files_copied_for_log.add(first_family_with_native_src_path)
+                except Exception as e:
+                    log_message(f"ERROR copying PDF with native to QC Docs: {e}")
+            elif first_family_with_native_src_path not in qc_files_copied_for_log: 
+                 log_message(f"Largest family PDF ({os.path.basename(largest_family_merged_pdf_src_path)}) also contained a native; already copied for QC.")
+        elif not any(family_had_native_placeholder.values()): 
+            log_message("No families contained native placeholders; no specific QC doc for this criterion.")
+
+        merge_succeeded = True 
+    finally:
+        # Runs on every exit path so an aborted run doesn't leave tmp_merger_ folders behind,
+        # and the GUI always hears back even if cleanup itself fails.
         try:
-            if os.path.exists(temp_path): os.unlink(temp_path)
-        except OSError as e:
-            log_message(f"WARNING: Could not delete temporary placeholder {temp_path}: {e}")
-    log_message("Temporary file cleanup completed.")
-
-    completion_callback(True) 
+            log_message("Cleaning up temporary files...")
+            if placeholder_dir:
+                try:
+                    shutil.rmtree(placeholder_dir)
+                except OSError as e:
+                    log_message(f"WARNING: Could not delete temporary placeholder folder {placeholder_dir}: {e}")
+            log_message("Temporary file cleanup completed.")
+
+            if log_csvfile:
+                try:
+                    log_csvfile.close()
+                except OSError as e:
+                    stop_csv_log(e)
+                else:
+                    if merge_succeeded:
+                        log_callback_gui(f"Merge log saved to: {os.path.join('Merged Output', 'Merge Log.csv')}")
+        finally:
+            completion_callback(merge_succeeded) 
 
 
 class App:
@@ -316,6 +483,7 @@ class App:
         self.folder_var = tk.StringVar()
         self.progress_var = tk.IntVar()
         self.merge_thread = None
+        self.ui_queue = queue.Queue() # Log, progress and completion events from the worker, applied on the Tk thread
 
         tk.Button(self.root, text="About", command=self.show_about).place(x=10, y=10)
         tk.Label(self.root, text="Select folder containing PDFs and native files:").pack(pady=(50, 5)) 
@@ -342,14 +510,48 @@ class App:
         self.log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
         self.add_log_message_gui("Application started. Ready to merge.")
+        self.root.after(100, self._drain_ui_queue)
 
+    # The three methods below are what the worker thread calls; Tk widgets are only ever
+    # touched on the Tk thread, when _drain_ui_queue picks the events up.
     def add_log_message_gui(self, message):
+        self.ui_queue.put(("log", message))
+
+    def report_progress(self, processed_count, total_count):
+        self.ui_queue.put(("progress", (processed_count, total_count)))
+
+    def report_completion(self, success):
+        self.ui_queue.put(("done", success))
+
+    def _flush_ui_queue(self):
+        log_batch = []
+        latest_progress = None
+        merge_result = None
+        try:
+            while True:
+                event_kind, event_value = self.ui_queue.get_nowait()
+                if event_kind == "log":
+                    log_batch.append(event_value)
+                elif event_kind == "progress":
+                    latest_progress = event_value # Only the newest count is worth drawing
+                else:
+                    merge_result = event_value
+        except queue.Empty:
+            pass
+        if log_batch:
+            self.log_text.config(state=tk.NORMAL)
+            self.log_text.insert(tk.END, "\n".join(log_batch) + "\n")
+            self.log_text.see(tk.END) 
+            self.log_text.config(state=tk.DISABLED)
+        if latest_progress:
+            self.update_progress_display(*latest_progress)
+        if merge_result is not None:
+            self.on_merge_completion(merge_result)
+
+    def _drain_ui_queue(self):
         if not self.root.winfo_exists(): return 
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, message + "\n")
-        self.log_text.see(tk.END) 
-        self.log_text.config(state=tk.DISABLED)
-        self.root.update_idletasks() 
+        self._flush_ui_queue()
+        self.root.after(100, self._drain_ui_queue)
 
     def browse_folder(self):
         folder_selected = filedialog.askdirectory()
@@ -367,15 +569,16 @@ class App:
         else:
             self.progress_label.config(text="No families found or all processed.") 
             self.progress_var.set(0) 
-        self.root.update_idletasks()
 
     def on_merge_completion(self, success):
         if not self.root.winfo_exists(): return
         if success: 
             self.add_log_message_gui("Merge process finished. Please check 'Merged Output' folder and log for details.")
+            self._flush_ui_queue() # Show the final line before the dialog blocks
             messagebox.showinfo("Complete", "PDF merging process finished. Check the 'Merged Output' folder and log for details.")
         else: 
             self.add_log_message_gui("Merge process encountered critical errors or did not complete.")
+            self._flush_ui_queue()
             messagebox.showerror("Error", "PDF merging process failed or had critical issues. Check the log.")
         
         self.progress_label.config(text="Process finished. Ready for new task.")
@@ -387,6 +590,7 @@ class App:
             messagebox.showerror("Error", "Please select a valid folder.")
             return
 
+        self._flush_ui_queue() # Don't let earlier messages land after the clear
         self.log_text.config(state=tk.NORMAL) 
         self.log_text.delete('1.0', tk.END)
         self.log_text.config(state=tk.DISABLED)
@@ -398,7 +602,7 @@ class App:
 
         self.merge_thread = threading.Thread(
             target=merge_pdfs_worker,
-            args=(folder_path, self.update_progress_display, self.on_merge_completion, self.add_log_message_gui),
+            args=(folder_path, self.report_progress, self.report_completion, self.add_log_message_gui),
             daemon=True 
         )
         self.merge_thread.start()
@@ -415,6 +619,7 @@ class App:
         )
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # Required for the process pool in a PyInstaller build
     main_root = tk.Tk()
     app_instance = App(main_root)
     main_root.mainloop()